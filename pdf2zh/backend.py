@@ -5,9 +5,13 @@ from pdf2zh import translate_stream
 import tqdm
 import json
 import io
+import logging
+import time
 from pdf2zh.doclayout import ModelInstance
 from pdf2zh.config import ConfigManager
 
+logger = logging.getLogger(__name__)
+
 flask_app = Flask("pdf2zh")
 flask_app.config.from_mapping(
     CELERY=dict(
@@ -41,9 +45,18 @@ def translate_task(
     stream: bytes,
     args: dict,
 ):
+    last = {"pct": -1, "ts": 0.0}
+
     def progress_bar(t: tqdm.tqdm):
-        self.update_state(state="PROGRESS", meta={"n": t.n, "total": t.total})  # noqa
-        print(f"Translating {t.n} / {t.total} pages")
+        # Coalesce backend writes: at most once a second per percent, always the last page
+        pct = t.n * 100 // t.total if t.total else 100
+        now = time.monotonic()
+        if t.n == t.total or (pct != last["pct"] and now - last["ts"] >= 1.0):
+            self.update_state(  # noqa
+                state="PROGRESS", meta={"n": t.n, "total": t.total}
+            )
+            last["pct"], last["ts"] = pct, now
+        logger.info("Translating %d / %d pages", t.n, t.total)
 
     doc_mono, doc_dual = translate_stream(
         stream,
@@ -58,7 +71,7 @@ def translate_task(
 def create_translate_tasks():
     file = request.files["file"]
     stream = file.stream.read()
-    print(request.form.get("data"))
+    logger.debug("Translate task data: %s", request.form.get("data"))
     args = json.loads(request.form.get("data"))
     task = translate_task.delay(stream, args)
     return {"id": task.id}
@@ -1,14 +1,18 @@
 import logging
 import os
 import json
-from peewee import Model, SqliteDatabase, AutoField, CharField, TextField, SQL
+import threading
+from collections import OrderedDict
+from peewee import Model, SqliteDatabase, AutoField, CharField, TextField, SQL, chunked
 from typing import Optional
 
-
 # we don't init the database here
 db = SqliteDatabase(None)
 logger = logging.getLogger(__name__)
 
+# Number of translations each cache instance keeps in memory in front of sqlite.
+MEMORY_CACHE_SIZE = 10000
+
 
 class _TranslationCache(Model):
     id = AutoField()
@@ -52,6 +56,24 @@ class TranslationCache:
         ), "current cache require translate engine name less than 20 characters"
         self.translate_engine = translate_engine
         self.replace_params(translate_engine_params)
+        # In-memory LRU tier keyed by (params, original text), so repeated
+        # headers and captions don't hit sqlite on every lookup.
+        self._memory: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._memory_lock = threading.Lock()
+
+    def _memory_get(self, key: tuple[str, str]) -> Optional[str]:
+        with self._memory_lock:
+            translation = self._memory.get(key)
+            if translation is not None:
+                self._memory.move_to_end(key)
+            return translation
+
+    def _memory_set(self, key: tuple[str, str], translation: str):
+        with self._memory_lock:
+            self._memory[key] = translation
+            self._memory.move_to_end(key)
+            if len(self._memory) > MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
 
     # The program typically starts multi-threaded translation
     # only after cache parameters are fully configured,
@@ -74,16 +96,63 @@ class TranslationCache:
         self.replace_params(self.params)
 
     # Since peewee and the underlying sqlite are thread-safe,
-    # get and set operations don't need locks.
+    # get and set operations only lock the in-memory tier.
     def get(self, original_text: str) -> Optional[str]:
+        key = (self.translate_engine_params, original_text)
+        translation = self._memory_get(key)
+        if translation is not None:
+            return translation
         result = _TranslationCache.get_or_none(
             translate_engine=self.translate_engine,
             translate_engine_params=self.translate_engine_params,
             original_text=original_text,
         )
-        return result.translation if result else None
+        if result is None:
+            return None
+        self._memory_set(key, result.translation)
+        return result.translation
+
+    def get_many(self, original_texts: list[str]) -> list[Optional[str]]:
+        """Look up several texts, reading all memory misses with one query."""
+        translations = [
+            self._memory_get((self.translate_engine_params, text))
+            for text in original_texts
+        ]
+        missing = list(
+            dict.fromkeys(
+                text
+                for text, translation in zip(original_texts, translations)
+                if translation is None
+            )
+        )
+        if not missing:
+            return translations
+        found = {}
+        # Stay well below sqlite's bound-variable limit
+        for i in range(0, len(missing), 500):
+            query = _TranslationCache.select(
+                _TranslationCache.original_text, _TranslationCache.translation
+            ).where(
+                (_TranslationCache.translate_engine == self.translate_engine)
+                & (
+                    _TranslationCache.translate_engine_params
+                    == self.translate_engine_params
+                )
+                & (_TranslationCache.original_text.in_(missing[i : i + 500]))
+            )
+            for row in query:
+                found[row.original_text] = row.translation
+                self._memory_set(
+                    (self.translate_engine_params, row.original_text),
+                    row.translation,
+                )
+        return [
+            translation if translation is not None else found.get(text)
+            for text, translation in zip(original_texts, translations)
+        ]
 
     def set(self, original_text: str, translation: str):
+        self._memory_set((self.translate_engine_params, original_text), translation)
         try:
             _TranslationCache.create(
                 translate_engine=self.translate_engine,
@@ -92,7 +161,30 @@ class TranslationCache:
                 translation=translation,
             )
         except Exception as e:
-            logger.debug(f"Error setting cache: {e}")
+            logger.debug("Error setting cache: %s", e)
+
+    def set_many(self, items: list[tuple[str, str]]):
+        """Write several (original_text, translation) pairs in one transaction."""
+        if not items:
+            return
+        for original_text, translation in items:
+            self._memory_set((self.translate_engine_params, original_text), translation)
+        rows = [
+            {
+                "translate_engine": self.translate_engine,
+                "translate_engine_params": self.translate_engine_params,
+                "original_text": original_text,
+                "translation": translation,
+            }
+            for original_text, translation in items
+        ]
+        try:
+            with _TranslationCache._meta.database.atomic():
+                # 4 bound variables per row, stay well below sqlite's limit
+                for batch in chunked(rows, 200):
+                    _TranslationCache.insert_many(batch).execute()
+        except Exception as e:
+            logger.debug("Error setting cache: %s", e)
 
 
 def init_db(remove_exists=False):
@@ -106,6 +198,8 @@ def init_db(remove_exists=False):
         cache_db_path,
         pragmas={
             "journal_mode": "wal",
+            # WAL stays consistent with normal sync; skips an fsync per write
+            "synchronous": "normal",
             "busy_timeout": 1000,
         },
     )
@@ -120,6 +214,8 @@ def init_test_db():
         cache_db_path,
         pragmas={
             "journal_mode": "wal",
+            # WAL stays consistent with normal sync; skips an fsync per write
+            "synchronous": "normal",
             "busy_timeout": 1000,
         },
     )
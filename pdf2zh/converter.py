@@ -6,14 +6,21 @@ from enum import Enum
 from string import Template
 from typing import Dict
 
-import numpy as np
+import httpx
+import requests
 from pdfminer.converter import PDFConverter
 from pdfminer.layout import LTChar, LTFigure, LTLine, LTPage
-from pdfminer.pdffont import PDFCIDFont, PDFUnicodeNotDefined
+from pdfminer.pdffont import PDFCIDFont, PDFFont, PDFUnicodeNotDefined
 from pdfminer.pdfinterp import PDFGraphicState, PDFResourceManager
 from pdfminer.utils import apply_matrix_pt, mult_matrix
 from pymupdf import Font
-from tenacity import retry, wait_fixed
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from pdf2zh.translator import (
     AnythingLLMTranslator,
@@ -43,6 +50,74 @@ from pdf2zh.translator import (
 
 log = logging.getLogger(__name__)
 
+LANG_LINEHEIGHT_MAP = {
+    "zh-cn": 1.4, "zh-tw": 1.4, "zh-hans": 1.4, "zh-hant": 1.4, "zh": 1.4,
+    "ja": 1.1, "ko": 1.2, "en": 1.2, "ar": 1.0, "ru": 0.8, "uk": 0.8, "ta": 0.8
+}  # fmt: skip
+
+LATEX_FONT_RE = re.compile(
+    r"(CM[^R]|MS.M|XY|MT|BL|RM|EU|LA|RS|LINE|LCIRCLE|TeX-|rsfs|txsy|wasy|stmary|.*Mono|.*Code|.*Ital|.*Sym|.*Math)"
+)
+VCHAR_CATEGORIES = frozenset(["Lm", "Mn", "Sk", "Sm", "Zl", "Zp", "Zs"])
+VAR_MARK_RE = re.compile(r"\{v\d+\}")  # 段落中的公式标记
+NOTRANS_RE = re.compile(
+    r"\s*(?:https?://\S+|www\.\S+|[\w.+-]+@[\w-]+(?:\.[\w-]+)+)\s*"
+)  # 整段只是网址或邮箱
+
+
+RETRY_ATTEMPTS = 5  # 翻译请求最多尝试次数
+backoff = wait_random_exponential(multiplier=0.5, max=8)  # 带随机抖动的指数退避
+
+
+def wait_retry_after(retry_state: RetryCallState) -> float:
+    # 限流（429/503）时服务端会通过 Retry-After 告知等待时间，没有时指数退避
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return min(max(float(headers.get("retry-after")), 0), 60)
+    except (TypeError, ValueError):
+        return backoff(retry_state)
+
+
+def _status_code(exception: BaseException) -> int | None:
+    # openai 等 SDK 的异常自带 status_code，requests/httpx 的在 response 上
+    status = getattr(exception, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(exception, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def terminal_error(exception: BaseException) -> bool:
+    # 鉴权失败、参数错误等 4xx 重试也不会成功，直接抛出；超时、冲突和限流除外
+    status = _status_code(exception)
+    return status is not None and 400 <= status < 500 and status not in (408, 409, 429)
+
+
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    httpx.TransportError,
+)
+
+
+def transient_error(exception: BaseException) -> bool:
+    # 只重试超时、连接错误、限流和服务端错误，其余异常（包括程序错误）直接抛出
+    status = _status_code(exception)
+    if status is not None:
+        return status >= 500 or (status >= 400 and not terminal_error(exception))
+    while exception is not None:  # SDK 会把底层的网络异常包装一层
+        if isinstance(exception, TRANSIENT_ERRORS):
+            return True
+        exception = exception.__cause__
+    return False
+
+
+def _clip(v: int, hi: int) -> int:
+    # 标量版 np.clip(v, 0, hi)，省去逐字符的 numpy 调用开销
+    return 0 if v < 0 else (hi if v > hi else v)
+
 
 class PDFConverterEx(PDFConverter):
     def __init__(
@@ -50,6 +125,8 @@ class PDFConverterEx(PDFConverter):
         rsrcmgr: PDFResourceManager,
     ) -> None:
         PDFConverter.__init__(self, rsrcmgr, None, "utf-8", 1, None)
+        self.fontmap: Dict[object, PDFFont] = {}  # 由解释器在处理页面时设置
+        self.fontid: Dict[PDFFont, object] = {}
 
     def begin_page(self, page, ctm) -> None:
         # 重载替换 cropbox
@@ -126,6 +203,29 @@ class Paragraph:
         self.brk: bool = brk  # 换行标记
 
 
+class ParagraphText:
+    def __init__(self):
+        self.parts: list[str] = []  # 文字片段，翻译前再拼接，避免反复拼接字符串
+        self.size: int = 0  # 文字总长度
+        self.head: int = -1  # 首个非空白字符位置
+        self.tail: int = 0  # 末个非空白字符之后的位置
+
+    def append(self, s: str):
+        if s.strip():
+            if self.head < 0:
+                self.head = self.size + len(s) - len(s.lstrip())
+            self.tail = self.size + len(s.rstrip())
+        self.parts.append(s)
+        self.size += len(s)
+
+    def strip_len(self) -> int:
+        # 等价于 len(str(self).strip())，不需要拼接
+        return self.tail - self.head if self.head >= 0 else 0
+
+    def __str__(self) -> str:
+        return "".join(self.parts)
+
+
 # fmt: off
 class TranslateConverter(PDFConverterEx):
     def __init__(
@@ -146,7 +246,13 @@ class TranslateConverter(PDFConverterEx):
         super().__init__(rsrcmgr)
         self.vfont = vfont
         self.vchar = vchar
+        # 自定义规则只编译一次，每个字符都会用到
+        self.vfont_re = re.compile(vfont) if vfont else None
+        self.vchar_re = re.compile(vchar) if vchar else None
+        self.vfont_flags: dict[str, bool] = {}  # 字体名 -> 是否为公式字体
         self.thread = thread
+        # 整个文档复用同一个线程池，thread 为 0 时使用默认线程数
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=thread or None)
         self.layout = layout
         self.noto_name = noto_name
         self.noto = noto
@@ -163,10 +269,53 @@ class TranslateConverter(PDFConverterEx):
                 self.translator = translator(lang_in, lang_out, service_model, envs=envs, prompt=prompt)
         if not self.translator:
             raise ValueError("Unsupported translation service")
+        # 根据目标语言获取默认行距，整个文档不变
+        self.default_line_height = LANG_LINEHEIGHT_MAP.get(self.translator.lang_out.lower(), 1.1) # 小语种默认1.1
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+        super().close()
+
+    def translate_paragraphs(self, strings: list[str]) -> list[str]:
+        def skip(s: str):  # 空白、公式、纯数字和符号、网址邮箱不翻译
+            s = VAR_MARK_RE.sub("", s)
+            return not any(ch.isalpha() for ch in s) or NOTRANS_RE.fullmatch(s) is not None
+
+        def call(fn, arg):  # 记录翻译异常后抛出，由 retry 决定是否重试
+            try:
+                return fn(arg)
+            except BaseException as e:
+                if log.isEnabledFor(logging.DEBUG):
+                    log.exception(e)
+                else:
+                    log.exception(e, exc_info=False)
+                raise e
+
+        @retry(wait=wait_retry_after, retry=retry_if_exception(transient_error), stop=stop_after_attempt(RETRY_ATTEMPTS), reraise=True)
+        def worker(s: str):  # 多线程翻译
+            if skip(s):
+                return s
+            return call(self.translator.translate, s)
+
+        @retry(wait=wait_retry_after, retry=retry_if_exception(transient_error), stop=stop_after_attempt(RETRY_ATTEMPTS), reraise=True)
+        def batch_worker(texts: list[str]):  # 多个段落合并成一次请求翻译
+            return call(self.translator.translate_batch, texts)
+
+        uniq = list(dict.fromkeys(strings))  # 页内重复的段落只翻译一次
+        batch_size = self.translator.batch_size
+        if batch_size > 1:  # 翻译服务支持批量请求
+            todo = [s for s in uniq if not skip(s)]
+            chunks = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+            translated = dict(zip(uniq, uniq))
+            for chunk, result in zip(chunks, self.pool.map(batch_worker, chunks)):
+                translated.update(zip(chunk, result))
+        else:
+            translated = dict(zip(uniq, self.pool.map(worker, uniq)))
+        return [translated[s] for s in strings]
 
     def receive_layout(self, ltpage: LTPage):
         # 段落
-        sstk: list[str] = []            # 段落文字栈
+        sstk: list[ParagraphText] = []  # 段落文字栈
         pstk: list[Paragraph] = []      # 段落属性栈
         vbkt: int = 0                   # 段落公式括号计数
         # 公式组
@@ -183,30 +332,37 @@ class TranslateConverter(PDFConverterEx):
         xt: LTChar = None               # 上一个字符
         xt_cls: int = -1                # 上一个字符所属段落，保证无论第一个字符属于哪个类别都可以触发新段落
         vmax: float = ltpage.width / 4  # 行内公式最大宽度
-        ops: str = ""                   # 渲染结果
 
-        def vflag(font: str, char: str):    # 匹配公式（和角标）字体
+        vfont_re, vchar_re = self.vfont_re, self.vchar_re
+        vfont_flags = self.vfont_flags
+
+        def vfont_flag(fontname: str):      # 基于字体名规则的判定，结果只和字体有关
+            font = fontname
             if isinstance(font, bytes):     # 不一定能 decode，直接转 str
                 try:
                     font = font.decode('utf-8')  # 尝试使用 UTF-8 解码
                 except UnicodeDecodeError:
                     font = ""
             font = font.split("+")[-1]      # 字体名截断
-            if re.match(r"\(cid:", char):
+            if vfont_re:
+                flag = bool(vfont_re.match(font))
+            else:
+                flag = bool(LATEX_FONT_RE.match(font))                  # latex 字体
+            vfont_flags[fontname] = flag
+            return flag
+
+        def vflag(font: str, char: str):    # 匹配公式（和角标）字体
+            if char.startswith("(cid:"):
                 return True
             # 基于字体名规则的判定
-            if self.vfont:
-                if re.match(self.vfont, font):
-                    return True
-            else:
-                if re.match(                                            # latex 字体
-                    r"(CM[^R]|MS.M|XY|MT|BL|RM|EU|LA|RS|LINE|LCIRCLE|TeX-|rsfs|txsy|wasy|stmary|.*Mono|.*Code|.*Ital|.*Sym|.*Math)",
-                    font,
-                ):
-                    return True
+            flag = vfont_flags.get(font)
+            if flag is None:
+                flag = vfont_flag(font)
+            if flag:
+                return True
             # 基于字符集规则的判定
-            if self.vchar:
-                if re.match(self.vchar, char):
+            if vchar_re:
+                if vchar_re.match(char):
                     return True
             else:
                 if (
@@ -214,23 +370,24 @@ class TranslateConverter(PDFConverterEx):
                     and char != " "                                     # 非空格
                     and (
                         unicodedata.category(char[0])
-                        in ["Lm", "Mn", "Sk", "Sm", "Zl", "Zp", "Zs"]   # 文字修饰符、数学符号、分隔符号
+                        in VCHAR_CATEGORIES                             # 文字修饰符、数学符号、分隔符号
                         or ord(char[0]) in range(0x370, 0x400)          # 希腊字母
                     )
                 ):
                     return True
             return False
 
+        layout = self.layout[ltpage.pageid]
+        # ltpage.height 可能是 fig 里面的高度，这里统一用 layout.shape
+        h, w = layout.shape
+
         ############################################################
         # A. 原文档解析
         for child in ltpage:
             if isinstance(child, LTChar):
                 cur_v = False
-                layout = self.layout[ltpage.pageid]
-                # ltpage.height 可能是 fig 里面的高度，这里统一用 layout.shape
-                h, w = layout.shape
                 # 读取当前字符在 layout 中的类别
-                cx, cy = np.clip(int(child.x0), 0, w - 1), np.clip(int(child.y0), 0, h - 1)
+                cx, cy = _clip(int(child.x0), w - 1), _clip(int(child.y0), h - 1)
                 cls = layout[cy, cx]
                 # 锚定文档中 bullet 的位置
                 if child.get_text() == "•":
@@ -238,7 +395,7 @@ class TranslateConverter(PDFConverterEx):
                 # 判定当前字符是否属于公式
                 if (                                                                                        # 判定当前字符是否属于公式
                     cls == 0                                                                                # 1. 类别为保留区域
-                    or (cls == xt_cls and len(sstk[-1].strip()) > 1 and child.size < pstk[-1].size * 0.79)  # 2. 角标字体，有 0.76 的角标和 0.799 的大写，这里用 0.79 取中，同时考虑首字母放大的情况
+                    or (cls == xt_cls and sstk[-1].strip_len() > 1 and child.size < pstk[-1].size * 0.79)  # 2. 角标字体，有 0.76 的角标和 0.799 的大写，这里用 0.79 取中，同时考虑首字母放大的情况
                     or vflag(child.fontname, child.get_text())                                              # 3. 公式字体
                     or (child.matrix[0] == 0 and child.matrix[3] == 0)                                      # 4. 垂直字体
                 ):
@@ -258,7 +415,7 @@ class TranslateConverter(PDFConverterEx):
                     # 禁止纯公式（代码）段落换行，直到文字开始再重开文字段落，保证只存在两种情况
                     # A. 纯公式（代码）段落（锚定绝对位置）sstk[-1]=="" -> sstk[-1]=="{v*}"
                     # B. 文字开头段落（排版相对位置）sstk[-1]!=""
-                    or (sstk[-1] != "" and abs(child.x0 - xt.x0) > vmax)    # 因为 cls==xt_cls==0 一定有 sstk[-1]==""，所以这里不需要再判定 cls!=0
+                    or (sstk[-1].size and abs(child.x0 - xt.x0) > vmax)    # 因为 cls==xt_cls==0 一定有 sstk[-1]==""，所以这里不需要再判定 cls!=0
                 ):
                     if vstk:
                         if (                                                # 根据公式右侧的文字修正公式的纵向偏移
@@ -267,9 +424,9 @@ class TranslateConverter(PDFConverterEx):
                             and child.x0 > max([vch.x0 for vch in vstk])    # 3. 当前字符在公式右侧
                         ):
                             vfix = vstk[0].y0 - child.y0
-                        if sstk[-1] == "":
+                        if not sstk[-1].size:
                             xt_cls = -1 # 禁止纯公式段落（sstk[-1]=="{v*}"）的后续连接，但是要考虑新字符和后续字符的连接，所以这里修改的是上个字符的类别
-                        sstk[-1] += f"{{v{len(var)}}}"
+                        sstk[-1].append(f"{{v{len(var)}}}")
                         var.append(vstk)
                         varl.append(vlstk)
                         varf.append(vfix)
@@ -280,21 +437,21 @@ class TranslateConverter(PDFConverterEx):
                 if not vstk:
                     if cls == xt_cls:               # 当前字符与前一个字符属于同一段落
                         if child.x0 > xt.x1 + 1:    # 添加行内空格
-                            sstk[-1] += " "
+                            sstk[-1].append(" ")
                         elif child.x1 < xt.x0:      # 添加换行空格并标记原文段落存在换行
-                            sstk[-1] += " "
+                            sstk[-1].append(" ")
                             pstk[-1].brk = True
                     else:                           # 根据当前字符构建一个新的段落
-                        sstk.append("")
+                        sstk.append(ParagraphText())
                         pstk.append(Paragraph(child.y0, child.x0, child.x0, child.x0, child.y0, child.y1, child.size, False))
                 if not cur_v:                                               # 文字入栈
                     if (                                                    # 根据当前字符修正段落属性
                         child.size > pstk[-1].size                          # 1. 当前字符比段落字体大
-                        or len(sstk[-1].strip()) == 1                       # 2. 当前字符为段落第二个文字（考虑首字母放大的情况）
+                        or sstk[-1].strip_len() == 1                        # 2. 当前字符为段落第二个文字（考虑首字母放大的情况）
                     ) and child.get_text() != " ":                          # 3. 当前字符不是空格
                         pstk[-1].y -= child.size - pstk[-1].size            # 修正段落初始纵坐标，假设两个不同大小字符的上边界对齐
                         pstk[-1].size = child.size
-                    sstk[-1] += child.get_text()
+                    sstk[-1].append(child.get_text())
                 else:                                                       # 公式入栈
                     if (                                                    # 根据公式左侧的文字修正公式的纵向偏移
                         not vstk                                            # 1. 当前字符是公式的第一个字符
@@ -314,11 +471,8 @@ class TranslateConverter(PDFConverterEx):
             elif isinstance(child, LTFigure):   # 图表
                 pass
             elif isinstance(child, LTLine):     # 线条
-                layout = self.layout[ltpage.pageid]
-                # ltpage.height 可能是 fig 里面的高度，这里统一用 layout.shape
-                h, w = layout.shape
                 # 读取当前线条在 layout 中的类别
-                cx, cy = np.clip(int(child.x0), 0, w - 1), np.clip(int(child.y0), 0, h - 1)
+                cx, cy = _clip(int(child.x0), w - 1), _clip(int(child.y0), h - 1)
                 cls = layout[cy, cx]
                 if vstk and cls == xt_cls:      # 公式线条
                     vlstk.append(child)
@@ -328,54 +482,39 @@ class TranslateConverter(PDFConverterEx):
                 pass
         # 处理结尾
         if vstk:    # 公式出栈
-            sstk[-1] += f"{{v{len(var)}}}"
+            sstk[-1].append(f"{{v{len(var)}}}")
             var.append(vstk)
             varl.append(vlstk)
             varf.append(vfix)
         log.debug("\n==========[VSTACK]==========\n")
         for id, v in enumerate(var):  # 计算公式宽度
             l = max([vch.x1 for vch in v]) - v[0].x0
-            log.debug(f'< {l:.1f} {v[0].x0:.1f} {v[0].y0:.1f} {v[0].cid} {v[0].fontname} {len(varl[id])} > v{id} = {"".join([ch.get_text() for ch in v])}')
+            if log.isEnabledFor(logging.DEBUG):  # 拼接公式文字开销较大，只在调试时做
+                log.debug("< %.1f %.1f %.1f %s %s %d > v%d = %s", l, v[0].x0, v[0].y0, v[0].cid, v[0].fontname, len(varl[id]), id, "".join([ch.get_text() for ch in v]))
             vlen.append(l)
 
         ############################################################
         # B. 段落翻译
         log.debug("\n==========[SSTACK]==========\n")
-
-        @retry(wait=wait_fixed(1))
-        def worker(s: str):  # 多线程翻译
-            if not s.strip() or re.match(r"^\{v\d+\}$", s):  # 空白和公式不翻译
-                return s
-            try:
-                new = self.translator.translate(s)
-                return new
-            except BaseException as e:
-                if log.isEnabledFor(logging.DEBUG):
-                    log.exception(e)
-                else:
-                    log.exception(e, exc_info=False)
-                raise e
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.thread
-        ) as executor:
-            news = list(executor.map(worker, sstk))
+        strings = [str(s) for s in sstk]  # 拼接段落文字，只在这里做一次
+        news = self.translate_paragraphs(strings)
 
         ############################################################
         # C. 新文档排版
+        # fontmap 随页面和图表更新，这里每次调用解析一次，避免逐字符查表
+        tiro = self.fontmap.get("tiro")
+        cid_fonts: dict[str, bool] = {}
+
         def raw_string(fcur: str, cstk: str):  # 编码字符串
             if fcur == self.noto_name:
                 return "".join(["%04x" % self.noto.has_glyph(ord(c)) for c in cstk])
-            elif isinstance(self.fontmap[fcur], PDFCIDFont):  # 判断编码长度
+            if fcur not in cid_fonts:
+                cid_fonts[fcur] = isinstance(self.fontmap[fcur], PDFCIDFont)
+            if cid_fonts[fcur]:  # 判断编码长度
                 return "".join(["%04x" % ord(c) for c in cstk])
             else:
                 return "".join(["%02x" % ord(c) for c in cstk])
 
-        # 根据目标语言获取默认行距
-        LANG_LINEHEIGHT_MAP = {
-            "zh-cn": 1.4, "zh-tw": 1.4, "zh-hans": 1.4, "zh-hant": 1.4, "zh": 1.4,
-            "ja": 1.1, "ko": 1.2, "en": 1.2, "ar": 1.0, "ru": 0.8, "uk": 0.8, "ta": 0.8
-        }
-        default_line_height = LANG_LINEHEIGHT_MAP.get(self.translator.lang_out.lower(), 1.1) # 小语种默认1.1
         _x, _y = 0, 0
         ops_list = []
 
@@ -399,7 +538,7 @@ class TranslateConverter(PDFConverterEx):
             tx = x
             fcur_ = fcur
             ptr = 0
-            log.debug(f"< {y} {x} {x0} {x1} {size} {brk} > {sstk[id]} | {new}")
+            log.debug("< %s %s %s %s %s %s > %s | %s", y, x, x0, x1, size, brk, strings[id], new)
 
             ops_vals: list[dict] = []
 
@@ -421,7 +560,7 @@ class TranslateConverter(PDFConverterEx):
                     ch = new[ptr]
                     fcur_ = None
                     try:
-                        if fcur_ is None and self.fontmap["tiro"].to_unichr(ord(ch)) == ch:
+                        if fcur_ is None and tiro.to_unichr(ord(ch)) == ch:
                             fcur_ = "tiro"  # 默认拉丁字体
                     except Exception:
                         pass
@@ -430,7 +569,7 @@ class TranslateConverter(PDFConverterEx):
                     if fcur_ == self.noto_name: # FIXME: change to CONST
                         adv = self.noto.char_lengths(ch, size)[0]
                     else:
-                        adv = self.fontmap[fcur_].char_width(ord(ch)) * size
+                        adv = tiro.char_width(ord(ch)) * size
                     ptr += 1
                 if (                                # 输出文字缓冲区
                     fcur_ != fcur                   # 1. 字体更新
@@ -507,7 +646,7 @@ class TranslateConverter(PDFConverterEx):
                     "lidx": lidx
                 })
 
-            line_height = default_line_height
+            line_height = self.default_line_height
 
             while (lidx + 1) * size * line_height > height and line_height >= 1:
                 line_height -= 0.05
@@ -522,8 +661,7 @@ class TranslateConverter(PDFConverterEx):
             if l.linewidth < 5:  # hack 有的文档会用粗线条当图片背景
                 ops_list.append(gen_op_line(l.pts[0][0], l.pts[0][1], l.pts[1][0] - l.pts[0][0], l.pts[1][1] - l.pts[0][1], l.linewidth))
 
-        ops = f"BT {''.join(ops_list)}ET "
-        return ops
+        return f"BT {''.join(ops_list)}ET "
 
 
 class OpType(Enum):
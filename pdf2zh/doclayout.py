@@ -1,5 +1,4 @@
 import abc
-import os.path
 
 import cv2
 import numpy as np
@@ -17,10 +16,6 @@ except ImportError as e:
         ) from e
     raise
 
-from huggingface_hub import hf_hub_download
-
-from pdf2zh.config import ConfigManager
-
 
 class DocLayoutModel(abc.ABC):
     @staticmethod
@@ -50,6 +45,25 @@ class DocLayoutModel(abc.ABC):
         """
         pass
 
+    def predict_batch(self, images, imgsz=1024, **kwargs) -> list:
+        """
+        Predict the layouts of several document pages.
+
+        Args:
+            images: The images of the document pages.
+            imgsz: Resize size for all images, or one size per image.
+            **kwargs: Additional arguments.
+
+        Returns:
+            One result per image, in the same order.
+        """
+        if isinstance(imgsz, int):
+            imgsz = [imgsz] * len(images)
+        return [
+            self.predict(image, imgsz=size, **kwargs)[0]
+            for image, size in zip(images, imgsz)
+        ]
+
 
 class YoloResult:
     """Helper class to store detection results from ONNX model."""
@@ -79,6 +93,8 @@ class OnnxModel(DocLayoutModel):
         self._names = ast.literal_eval(metadata["names"])
 
         self.model = onnxruntime.InferenceSession(model.SerializeToString())
+        # Pages can only be stacked into one run if the batch dimension was exported as dynamic
+        self._dynamic_batch = not isinstance(self.model.get_inputs()[0].shape[0], int)
 
     @staticmethod
     def from_pretrained():
@@ -155,24 +171,41 @@ class OnnxModel(DocLayoutModel):
         boxes[..., :4] = (boxes[..., :4] - [pad_x, pad_y, pad_x, pad_y]) / gain
         return boxes
 
-    def predict(self, image, imgsz=1024, **kwargs):
-        # Preprocess input image
-        orig_h, orig_w = image.shape[:2]
+    def preprocess(self, image, imgsz):
         pix = self.resize_and_pad_image(image, new_shape=imgsz)
         pix = np.transpose(pix, (2, 0, 1))  # CHW
         pix = np.expand_dims(pix, axis=0)  # BCHW
         pix = pix.astype(np.float32) / 255.0  # Normalize to [0, 1]
-        new_h, new_w = pix.shape[2:]
+        return pix
+
+    def postprocess(self, preds, new_shape, orig_shape):
+        preds = preds[preds[..., 4] > 0.25]
+        preds[..., :4] = self.scale_boxes(new_shape, preds[..., :4], orig_shape)
+        return YoloResult(boxes=preds, names=self._names)
+
+    def predict(self, image, imgsz=1024, **kwargs):
+        # Preprocess input image
+        pix = self.preprocess(image, imgsz)
 
         # Run inference
         preds = self.model.run(None, {"images": pix})[0]
 
         # Postprocess predictions
-        preds = preds[preds[..., 4] > 0.25]
-        preds[..., :4] = self.scale_boxes(
-            (new_h, new_w), preds[..., :4], (orig_h, orig_w)
-        )
-        return [YoloResult(boxes=preds, names=self._names)]
+        return [self.postprocess(preds, pix.shape[2:], image.shape[:2])]
+
+    def predict_batch(self, images, imgsz=1024, **kwargs):
+        if isinstance(imgsz, int):
+            imgsz = [imgsz] * len(images)
+        pixs = [self.preprocess(image, size) for image, size in zip(images, imgsz)]
+        if not self._dynamic_batch or len({pix.shape for pix in pixs}) != 1:
+            # Static batch dimension or mixed page sizes, run page by page
+            preds = [self.model.run(None, {"images": pix})[0][0] for pix in pixs]
+        else:
+            preds = self.model.run(None, {"images": np.concatenate(pixs)})[0]
+        return [
+            self.postprocess(pred, pix.shape[2:], image.shape[:2])
+            for pred, pix, image in zip(preds, pixs, images)
+        ]
 
 
 class ModelInstance:
@@ -2,7 +2,6 @@ import asyncio
 import cgi
 import os
 import shutil
-from tracemalloc import Snapshot
 import uuid
 from asyncio import CancelledError
 from pathlib import Path
@@ -119,10 +118,10 @@ def verify_recaptcha(response):
     This function verifies the reCAPTCHA response.
     """
     recaptcha_url = "https://www.google.com/recaptcha/api/siteverify"
-    print("reCAPTCHA", server_key, response)
+    logger.debug("reCAPTCHA response: %s", response)
     data = {"secret": server_key, "response": response}
     result = requests.post(recaptcha_url, data=data).json()
-    print("reCAPTCHA", result.get("success"))
+    logger.debug("reCAPTCHA success: %s", result.get("success"))
     return result.get("success")
 
 
@@ -267,7 +266,8 @@ def translate_file(
     for i, env in enumerate(translator.envs.items()):
         _envs[env[0]] = envs[i]
 
-    print(f"Files before translation: {os.listdir(output)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Files before translation: %s", os.listdir(output))
 
     def progress_bar(t: tqdm.tqdm):
         desc = getattr(t, "desc", "Translating...")
@@ -303,7 +303,8 @@ def translate_file(
     except CancelledError:
         del cancellation_event_map[session_id]
         raise gr.Error("Translation cancelled")
-    print(f"Files after translation: {os.listdir(output)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Files after translation: %s", os.listdir(output))
 
     if not file_mono.exists() or not file_dual.exists():
         raise gr.Error("No output")
@@ -763,14 +764,14 @@ def parse_user_passwd(file_path: str) -> tuple:
             with open(file_path[1], "r", encoding="utf-8") as file:
                 content = file.read()
         except FileNotFoundError:
-            print(f"Error: File '{file_path[1]}' not found.")
+            logger.error("File '%s' not found.", file_path[1])
     try:
         with open(file_path[0], "r", encoding="utf-8") as file:
             tuple_list = [
                 tuple(line.strip().split(",")) for line in file if line.strip()
             ]
     except FileNotFoundError:
-        print(f"Error: File '{file_path[0]}' not found.")
+        logger.error("File '%s' not found.", file_path[0])
     return tuple_list, content
 
 
@@ -801,7 +802,7 @@ def setup_gui(
                     server_port=server_port,
                 )
             except Exception:
-                print(
+                logger.warning(
                     "Error launching GUI using 0.0.0.0.\nThis may be caused by global mode of proxy software."
                 )
                 try:
@@ -813,7 +814,7 @@ def setup_gui(
                         server_port=server_port,
                     )
                 except Exception:
-                    print(
+                    logger.warning(
                         "Error launching GUI using 127.0.0.1.\nThis may be caused by global mode of proxy software."
                     )
                     demo.launch(
@@ -831,7 +832,7 @@ def setup_gui(
                     server_port=server_port,
                 )
             except Exception:
-                print(
+                logger.warning(
                     "Error launching GUI using 0.0.0.0.\nThis may be caused by global mode of proxy software."
                 )
                 try:
@@ -845,7 +846,7 @@ def setup_gui(
                         server_port=server_port,
                     )
                 except Exception:
-                    print(
+                    logger.warning(
                         "Error launching GUI using 127.0.0.1.\nThis may be caused by global mode of proxy software."
                     )
                     demo.launch(
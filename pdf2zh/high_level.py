@@ -30,6 +30,7 @@ from pdf2zh.config import ConfigManager
 from babeldoc.assets.assets import get_font_and_metadata
 
 NOTO_NAME = "noto"
+LAYOUT_BATCH_SIZE = 4  # 每批做版面分析的页数
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +68,33 @@ def check_files(files: List[str]) -> List[str]:
     return missing_files
 
 
+def _process_layout_box(page_layout, h: int, w: int) -> np.ndarray:
+    # kdtree 是不可能 kdtree 的，不如直接渲染成图片，用空间换时间
+    box = np.ones((h, w))
+    vcls = ["abandon", "figure", "table", "isolate_formula", "formula_caption"]
+    for i, d in enumerate(page_layout.boxes):
+        if page_layout.names[int(d.cls)] not in vcls:
+            x0, y0, x1, y1 = d.xyxy.squeeze()
+            x0, y0, x1, y1 = (
+                max(0, min(int(x0 - 1), w - 1)),
+                max(0, min(int(h - y1 - 1), h - 1)),
+                max(0, min(int(x1 + 1), w - 1)),
+                max(0, min(int(h - y0 + 1), h - 1)),
+            )
+            box[y0:y1, x0:x1] = i + 2
+    for i, d in enumerate(page_layout.boxes):
+        if page_layout.names[int(d.cls)] in vcls:
+            x0, y0, x1, y1 = d.xyxy.squeeze()
+            x0, y0, x1, y1 = (
+                max(0, min(int(x0 - 1), w - 1)),
+                max(0, min(int(h - y1 - 1), h - 1)),
+                max(0, min(int(x1 + 1), w - 1)),
+                max(0, min(int(h - y0 + 1), h - 1)),
+            )
+            box[y0:y1, x0:x1] = 0
+    return box
+
+
 def translate_patch(
     inf: BinaryIO,
     pages: Optional[list[int]] = None,
@@ -113,46 +141,35 @@ def translate_patch(
 
     parser = PDFParser(inf)
     doc = PDFDocument(parser)
-    with tqdm.tqdm(total=total_pages) as progress:
-        for pageno, page in enumerate(PDFPage.create_pages(doc)):
+    buffers: list[np.ndarray] = []  # 复用的 BGR 图像缓冲区，页面尺寸不变时不再重新分配
+
+    def process_batch(batch: list[PDFPage], progress: tqdm.tqdm):
+        images, imgsz = [], []
+        for i, page in enumerate(batch):
+            pix = doc_zh[page.pageno].get_pixmap()
+            if i == len(buffers):
+                buffers.append(None)
+            if buffers[i] is None or buffers[i].shape != (pix.height, pix.width, 3):
+                buffers[i] = np.empty((pix.height, pix.width, 3), np.uint8)
+            # RGB -> BGR 一次拷贝进缓冲区，避免 fromstring 的额外拷贝和非连续视图
+            np.copyto(
+                buffers[i],
+                np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.width, 3)[
+                    :, :, ::-1
+                ],
+            )
+            images.append(buffers[i])
+            imgsz.append(int(pix.height / 32) * 32)
+        # 一批页面合并做版面分析，再逐页解析
+        page_layouts = model.predict_batch(images, imgsz=imgsz)
+        for page, image, page_layout in zip(batch, images, page_layouts):
             if cancellation_event and cancellation_event.is_set():
                 raise CancelledError("task cancelled")
-            if pages and (pageno not in pages):
-                continue
             progress.update()
             if callback:
                 callback(progress)
-            page.pageno = pageno
-            pix = doc_zh[page.pageno].get_pixmap()
-            image = np.fromstring(pix.samples, np.uint8).reshape(
-                pix.height, pix.width, 3
-            )[:, :, ::-1]
-            page_layout = model.predict(image, imgsz=int(pix.height / 32) * 32)[0]
-            # kdtree 是不可能 kdtree 的，不如直接渲染成图片，用空间换时间
-            box = np.ones((pix.height, pix.width))
-            h, w = box.shape
-            vcls = ["abandon", "figure", "table", "isolate_formula", "formula_caption"]
-            for i, d in enumerate(page_layout.boxes):
-                if page_layout.names[int(d.cls)] not in vcls:
-                    x0, y0, x1, y1 = d.xyxy.squeeze()
-                    x0, y0, x1, y1 = (
-                        np.clip(int(x0 - 1), 0, w - 1),
-                        np.clip(int(h - y1 - 1), 0, h - 1),
-                        np.clip(int(x1 + 1), 0, w - 1),
-                        np.clip(int(h - y0 + 1), 0, h - 1),
-                    )
-                    box[y0:y1, x0:x1] = i + 2
-            for i, d in enumerate(page_layout.boxes):
-                if page_layout.names[int(d.cls)] in vcls:
-                    x0, y0, x1, y1 = d.xyxy.squeeze()
-                    x0, y0, x1, y1 = (
-                        np.clip(int(x0 - 1), 0, w - 1),
-                        np.clip(int(h - y1 - 1), 0, h - 1),
-                        np.clip(int(x1 + 1), 0, w - 1),
-                        np.clip(int(h - y0 + 1), 0, h - 1),
-                    )
-                    box[y0:y1, x0:x1] = 0
-            layout[page.pageno] = box
+            h, w = image.shape[:2]
+            layout[page.pageno] = _process_layout_box(page_layout, h, w)
             # 新建一个 xref 存放新指令流
             page.page_xref = doc_zh.get_new_xref()  # hack 插入页面的新 xref
             doc_zh.update_object(page.page_xref, "<<>>")
@@ -160,7 +177,23 @@ def translate_patch(
             doc_zh[page.pageno].set_contents(page.page_xref)
             interpreter.process_page(page)
 
-    device.close()
+    try:
+        with tqdm.tqdm(total=total_pages) as progress:
+            batch = []
+            for pageno, page in enumerate(PDFPage.create_pages(doc)):
+                if cancellation_event and cancellation_event.is_set():
+                    raise CancelledError("task cancelled")
+                if pages and (pageno not in pages):
+                    continue
+                page.pageno = pageno
+                batch.append(page)
+                if len(batch) == LAYOUT_BATCH_SIZE:
+                    process_batch(batch, progress)
+                    batch = []
+            if batch:
+                process_batch(batch, progress)
+    finally:
+        device.close()  # 取消或出错时也要释放翻译线程池
     return obj_patch
 
 
@@ -407,6 +440,6 @@ def download_remote_fonts(lang: str):
         font_path, _ = get_font_and_metadata(font_name)
         font_path = font_path.as_posix()
 
-    logger.info(f"use font: {font_path}")
+    logger.info("use font: %s", font_path)
 
     return font_path
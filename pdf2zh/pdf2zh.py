@@ -288,7 +288,7 @@ def main(args: Optional[List[str]] = None) -> int:
         except Exception:
             raise ValueError("prompt error.")
 
-    print(parsed_args)
+    logger.debug("Parsed args: %s", parsed_args)
     if parsed_args.babeldoc:
         return yadt_main(parsed_args)
     if parsed_args.dir:
@@ -300,7 +300,7 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
 
     def execute(self, streams: Sequence[object]) -> None:
         # 重载返回指令流
-        ops = ""
+        ops: list[str] = []  # 指令片段，结束时一次拼接
         try:
             parser = PDFContentParser(streams)
         except PSEOF:
@@ -339,7 +339,7 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
                                         for x in args
                                     ]
                                 )
-                                ops += f"{p} {name} "
+                                ops.append(f"{p} {name} ")
                     else:
                         # log.debug("exec: %s", name)
                         targs = func()
@@ -356,11 +356,11 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
                                     for x in targs
                                 ]
                             )
-                            ops += f"{p} {name} "
+                            ops.append(f"{p} {name} ")
                 elif settings.STRICT:
                     error_msg = "Unknown operator: %r" % name
                     raise PDFInterpreterError(error_msg)
             else:
                 self.push(obj)
         # print('REV DATA',ops)
-        return ops
+        return "".join(ops)
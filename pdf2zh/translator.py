@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import html
 import json
 import logging
@@ -6,7 +8,7 @@ import re
 import unicodedata
 from copy import copy
 from string import Template
-from typing import cast
+from typing import TYPE_CHECKING, cast
 
 logger = logging.getLogger(__name__)
 
@@ -18,24 +20,93 @@ except ImportError:
         "argos-translate is not installed, if you want to use argostranslate, please install it. If you don't use argostranslate translator, you can safely ignore this warning."
     )
 
-import deepl
-import ollama
-import openai
+try:
+    import orjson
+except ImportError:  # optional, faster (de)serialization of request payloads
+    orjson = None
+
 import requests
-import xinference_client
-from azure.ai.translation.text import TextTranslationClient
-from azure.core.credentials import AzureKeyCredential
-from tencentcloud.common import credential
-from tencentcloud.tmt.v20180321.models import (
-    TextTranslateRequest,
-    TextTranslateResponse,
-)
-from tencentcloud.tmt.v20180321.tmt_client import TmtClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Service SDKs are imported where they are used, so only the selected backend is loaded
+if TYPE_CHECKING:
+    import deepl
+    import ollama
+    import openai
+    from tencentcloud.tmt.v20180321.models import TextTranslateResponse
 
 from pdf2zh.cache import TranslationCache
 from pdf2zh.config import ConfigManager
 
 
+def create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        # Only reconnect here; status retries and Retry-After are handled by the converter
+        max_retries=Retry(connect=3, read=0, status=0, backoff_factor=0.3),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by the HTTP translators so connections are kept alive across instances
+session = create_session()
+
+
+@functools.lru_cache(maxsize=None)
+def default_prompt_prefix(lang_out: str) -> str:
+    # Built once per target language so every request shares an identical prefix
+    return (
+        "You are a professional, authentic machine translation engine. "
+        "Only Output the translated text, do not include any other text."
+        "\n\n"
+        f"Translate the following markdown source text to {lang_out}. "
+        "Keep the formula notation {v*} unchanged. "
+        "Output translation directly without any additional text."
+        "\n\n"
+        "Source Text: "
+    )
+
+
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# SDK clients own connection pools, so translators with the same settings share one.
+# Bounded, since the GUI and backend see user supplied keys for the life of the process.
+@functools.lru_cache(maxsize=8)
+def get_openai_client(base_url: str, api_key: str) -> "openai.OpenAI":
+    import openai
+
+    return openai.OpenAI(base_url=base_url, api_key=api_key)
+
+
+@functools.lru_cache(maxsize=8)
+def get_ollama_client(host: str) -> "ollama.Client":
+    import ollama
+
+    return ollama.Client(host=host)
+
+
+@functools.lru_cache(maxsize=8)
+def get_deepl_client(auth_key: str) -> "deepl.Translator":
+    import deepl
+
+    return deepl.Translator(auth_key)
+
+
 def remove_control_characters(s):
     return "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
 
@@ -46,6 +117,8 @@ class BaseTranslator:
     lang_map: dict[str, str] = {}
     CustomPrompt = False
     ignore_cache = False
+    # Texts sent per request by translate_batch, > 1 only if do_translate_batch is native
+    batch_size = 1
 
     def __init__(self, lang_in: str, lang_out: str, model: str):
         lang_in = self.lang_map.get(lang_in.lower(), lang_in)
@@ -90,12 +163,22 @@ class BaseTranslator:
         """
         self.cache.add_params(k, v)
 
+    def is_noop(self, text: str) -> bool:
+        """
+        Whether translating the text cannot change it, so no request is needed.
+        :param text: text to translate
+        :return: True for blank text or when source and target language are the same
+        """
+        return not text.strip() or self.lang_in.lower() == self.lang_out.lower()
+
     def translate(self, text: str, ignore_cache: bool = False) -> str:
         """
         Translate the text, and the other part should call this method.
         :param text: text to translate
         :return: translated text
         """
+        if self.is_noop(text):
+            return text
         if not (self.ignore_cache or ignore_cache):
             cache = self.cache.get(text)
             if cache is not None:
@@ -105,6 +188,53 @@ class BaseTranslator:
         self.cache.set(text, translation)
         return translation
 
+    def translate_batch(
+        self, texts: list[str], ignore_cache: bool = False
+    ) -> list[str]:
+        """
+        Translate several texts, sending the cache misses to the service together.
+        :param texts: texts to translate
+        :return: translated texts, in the same order
+        """
+        translations: list[str | None] = [
+            text if self.is_noop(text) else None for text in texts
+        ]
+        if not (self.ignore_cache or ignore_cache):
+            translations = [
+                translation if translation is not None else cached
+                for translation, cached in zip(translations, self.cache.get_many(texts))
+            ]
+        missing = [
+            i for i, translation in enumerate(translations) if translation is None
+        ]
+        if missing:
+            results = self.do_translate_batch([texts[i] for i in missing])
+            if len(results) != len(missing):
+                raise ValueError(
+                    f"{self.name} returned {len(results)} translations for {len(missing)} texts"
+                )
+            for i, translation in zip(missing, results):
+                translations[i] = translation
+            self.cache.set_many([(texts[i], translations[i]) for i in missing])
+        return translations
+
+    def do_translate_batch(self, texts: list[str]) -> list[str]:
+        """
+        Actual translate several texts, override this method if the service accepts a list
+        :param texts: texts to translate
+        :return: translated texts, in the same order
+        """
+        return [self.do_translate(text) for text in texts]
+
+    async def atranslate(self, text: str, ignore_cache: bool = False) -> str:
+        """
+        Translate the text without blocking the event loop.
+        The blocking client call runs in the default executor, so callers can gather many requests.
+        :param text: text to translate
+        :return: translated text
+        """
+        return await asyncio.to_thread(self.translate, text, ignore_cache)
+
     def do_translate(self, text: str) -> str:
         """
         Actual translate text, override this method
@@ -138,14 +268,7 @@ class BaseTranslator:
             {
                 "role": "user",
                 "content": (
-                    "You are a professional, authentic machine translation engine. "
-                    "Only Output the translated text, do not include any other text."
-                    "\n\n"
-                    f"Translate the following markdown source text to {self.lang_out}. "
-                    "Keep the formula notation {v*} unchanged. "
-                    "Output translation directly without any additional text."
-                    "\n\n"
-                    f"Source Text: {text}"
+                    f"{default_prompt_prefix(self.lang_out)}{text}"
                     "\n\n"
                     "Translated Text:"
                 ),
@@ -170,10 +293,11 @@ class BaseTranslator:
 class GoogleTranslator(BaseTranslator):
     name = "google"
     lang_map = {"zh": "zh-CN"}
+    result_re = re.compile(r'class="(?:t0|result-container)">(.*?)<', re.DOTALL)
 
     def __init__(self, lang_in, lang_out, model, **kwargs):
         super().__init__(lang_in, lang_out, model)
-        self.session = requests.Session()
+        self.session = session
         self.endpoint = "https://translate.google.com/m"
         self.headers = {
             "User-Agent": "Mozilla/4.0 (compatible;MSIE 6.0;Windows NT 5.1;SV1;.NET CLR 1.1.4322;.NET CLR 2.0.50727;.NET CLR 3.0.04506.30)"  # noqa: E501
@@ -186,14 +310,14 @@ class GoogleTranslator(BaseTranslator):
             params={"tl": self.lang_out, "sl": self.lang_in, "q": text},
             headers=self.headers,
         )
-        re_result = re.findall(
-            r'(?s)class="(?:t0|result-container)">(.*?)<', response.text
-        )
         if response.status_code == 400:
             result = "IRREPARABLE TRANSLATION ERROR"
         else:
             response.raise_for_status()
-            result = html.unescape(re_result[0])
+            re_result = self.result_re.search(response.text)
+            if re_result is None:
+                raise ValueError("No translation found in google response")
+            result = html.unescape(re_result.group(1))
         return remove_control_characters(result)
 
 
@@ -246,12 +370,13 @@ class DeepLTranslator(BaseTranslator):
         "DEEPL_AUTH_KEY": None,
     }
     lang_map = {"zh": "zh-Hans"}
+    batch_size = 50  # DeepL accepts up to 50 texts per request
 
     def __init__(self, lang_in, lang_out, model, envs=None, **kwargs):
         self.set_envs(envs)
         super().__init__(lang_in, lang_out, model)
         auth_key = self.envs["DEEPL_AUTH_KEY"]
-        self.client = deepl.Translator(auth_key)
+        self.client = get_deepl_client(auth_key)
 
     def do_translate(self, text):
         response = self.client.translate_text(
@@ -259,6 +384,12 @@ class DeepLTranslator(BaseTranslator):
         )
         return response.text
 
+    def do_translate_batch(self, texts):
+        response = self.client.translate_text(
+            texts, target_lang=self.lang_out, source_lang=self.lang_in
+        )
+        return [result.text for result in response]
+
 
 class DeepLXTranslator(BaseTranslator):
     # https://deeplx.owo.network/endpoints/free.html
@@ -273,7 +404,7 @@ class DeepLXTranslator(BaseTranslator):
         self.set_envs(envs)
         super().__init__(lang_in, lang_out, model)
         self.endpoint = self.envs["DEEPLX_ENDPOINT"]
-        self.session = requests.Session()
+        self.session = session
         auth_key = self.envs["DEEPLX_ACCESS_TOKEN"]
         if auth_key:
             self.endpoint = f"{self.endpoint}?token={auth_key}"
@@ -281,14 +412,17 @@ class DeepLXTranslator(BaseTranslator):
     def do_translate(self, text):
         response = self.session.post(
             self.endpoint,
-            json={
-                "source_lang": self.lang_in,
-                "target_lang": self.lang_out,
-                "text": text,
-            },
+            data=json_dumps(
+                {
+                    "source_lang": self.lang_in,
+                    "target_lang": self.lang_out,
+                    "text": text,
+                }
+            ),
+            headers={"Content-Type": "application/json"},
         )
         response.raise_for_status()
-        return response.json()["data"]
+        return json_loads(response.content)["data"]
 
 
 class OllamaTranslator(BaseTranslator):
@@ -316,7 +450,7 @@ class OllamaTranslator(BaseTranslator):
             "temperature": 0,  # 随机采样可能会打断公式标记
             "num_predict": 2000,
         }
-        self.client = ollama.Client(host=self.envs["OLLAMA_HOST"])
+        self.client = get_ollama_client(self.envs["OLLAMA_HOST"])
         self.prompt_template = prompt
         self.add_cache_impact_parameters("temperature", self.options["temperature"])
 
@@ -357,6 +491,8 @@ class XinferenceTranslator(BaseTranslator):
             model = self.envs["XINFERENCE_MODEL"]
         super().__init__(lang_in, lang_out, model)
         self.options = {"temperature": 0}  # 随机采样可能会打断公式标记
+        import xinference_client
+
         self.client = xinference_client.RESTfulClient(self.envs["XINFERENCE_HOST"])
         self.prompttext = prompt
         self.add_cache_impact_parameters("temperature", self.options["temperature"])
@@ -387,7 +523,7 @@ class XinferenceTranslator(BaseTranslator):
                     raise Exception("Response too long")
                 return response.strip()
             except Exception as e:
-                print(e)
+                logger.debug("Xinference translation failed: %s", e)
         raise Exception("All models failed")
 
 
@@ -416,9 +552,9 @@ class OpenAITranslator(BaseTranslator):
             model = self.envs["OPENAI_MODEL"]
         super().__init__(lang_in, lang_out, model)
         self.options = {"temperature": 0}  # 随机采样可能会打断公式标记
-        self.client = openai.OpenAI(
-            base_url=base_url or self.envs["OPENAI_BASE_URL"],
-            api_key=api_key or self.envs["OPENAI_API_KEY"],
+        self.client = get_openai_client(
+            base_url or self.envs["OPENAI_BASE_URL"],
+            api_key or self.envs["OPENAI_API_KEY"],
         )
         self.prompttext = prompt
         self.add_cache_impact_parameters("temperature", self.options["temperature"])
@@ -475,6 +611,8 @@ class AzureOpenAITranslator(BaseTranslator):
             model = self.envs["AZURE_OPENAI_MODEL"]
         super().__init__(lang_in, lang_out, model)
         self.options = {"temperature": 0}
+        import openai
+
         self.client = openai.AzureOpenAI(
             azure_endpoint=base_url,
             azure_deployment=model,
@@ -543,6 +681,8 @@ class ZhipuTranslator(OpenAITranslator):
         self.add_cache_impact_parameters("prompt", self.prompt("", self.prompttext))
 
     def do_translate(self, text) -> str:
+        import openai
+
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -550,10 +690,8 @@ class ZhipuTranslator(OpenAITranslator):
                 messages=self.prompt(text, self.prompttext),
             )
         except openai.BadRequestError as e:
-            if (
-                json.loads(response.choices[0].message.content.strip())["error"]["code"]
-                == "1301"
-            ):
+            # 1301: content rejected by the service, retrying won't help
+            if e.code == "1301":
                 return "IRREPARABLE TRANSLATION ERROR"
             raise e
         return response.choices[0].message.content.strip()
@@ -607,12 +745,16 @@ class AzureTranslator(BaseTranslator):
         "AZURE_API_KEY": None,
     }
     lang_map = {"zh": "zh-Hans"}
+    batch_size = 100
 
     def __init__(self, lang_in, lang_out, model, envs=None, **kwargs):
         self.set_envs(envs)
         super().__init__(lang_in, lang_out, model)
         endpoint = self.envs["AZURE_ENDPOINT"]
         api_key = self.envs["AZURE_API_KEY"]
+        from azure.ai.translation.text import TextTranslationClient
+        from azure.core.credentials import AzureKeyCredential
+
         credential = AzureKeyCredential(api_key)
         self.client = TextTranslationClient(
             endpoint=endpoint, credential=credential, region="chinaeast2"
@@ -630,6 +772,14 @@ class AzureTranslator(BaseTranslator):
         translated_text = response[0].translations[0].text
         return translated_text
 
+    def do_translate_batch(self, texts):
+        response = self.client.translate(
+            body=list(texts),
+            from_language=self.lang_in,
+            to_language=[self.lang_out],
+        )
+        return [item.translations[0].text for item in response]
+
 
 class TencentTranslator(BaseTranslator):
     # https://github.com/TencentCloud/tencentcloud-sdk-python
@@ -642,6 +792,10 @@ class TencentTranslator(BaseTranslator):
     def __init__(self, lang_in, lang_out, model, envs=None, **kwargs):
         self.set_envs(envs)
         super().__init__(lang_in, lang_out, model)
+        from tencentcloud.common import credential
+        from tencentcloud.tmt.v20180321.models import TextTranslateRequest
+        from tencentcloud.tmt.v20180321.tmt_client import TmtClient
+
         cred = credential.DefaultCredentialProvider().get_credential()
         self.client = TmtClient(cred, "ap-beijing")
         self.req = TextTranslateRequest()
@@ -684,10 +838,10 @@ class AnythingLLMTranslator(BaseTranslator):
         }
 
         response = requests.post(
-            self.api_url, headers=self.headers, data=json.dumps(payload)
+            self.api_url, headers=self.headers, data=json_dumps(payload)
         )
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
 
         if "textResponse" in data:
             return data["textResponse"].strip()
@@ -724,10 +878,10 @@ class DifyTranslator(BaseTranslator):
 
         # 向 Dify 服务器发送请求
         response = requests.post(
-            self.api_url, headers=headers, data=json.dumps(payload)
+            self.api_url, headers=headers, data=json_dumps(payload)
         )
         response.raise_for_status()
-        response_data = response.json()
+        response_data = json_loads(response.content)
 
         # 解析响应
         return response_data.get("data", {}).get("outputs", {}).get("text", [])
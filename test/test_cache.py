@@ -159,6 +159,64 @@ class TestCache(unittest.TestCase):
         cache_instance.set("hello2", "你好2")
         self.assertEqual(cache_instance.get("hello2"), "你好2")
 
+    def test_memory_tier(self):
+        """Test in-memory tier serves hits and evicts least recently used"""
+        cache_instance = cache.TranslationCache("test_engine")
+        cache_instance.set("hello", "你好")
+
+        # Memory hit does not need the database row
+        cache._TranslationCache.delete().execute()
+        self.assertEqual(cache_instance.get("hello"), "你好")
+
+        # Params are part of the memory key
+        cache_instance.add_params("new_param", "new_value")
+        self.assertIsNone(cache_instance.get("hello"))
+
+        original_size = cache.MEMORY_CACHE_SIZE
+        cache.MEMORY_CACHE_SIZE = 2
+        try:
+            cache_instance.set("a", "1")
+            cache_instance.set("b", "2")
+            cache_instance.get("a")
+            cache_instance.set("c", "3")
+            cache._TranslationCache.delete().execute()
+            self.assertEqual(cache_instance.get("a"), "1")
+            self.assertIsNone(cache_instance.get("b"))
+        finally:
+            cache.MEMORY_CACHE_SIZE = original_size
+
+    def test_set_many(self):
+        """Test bulk writes reach the database and replace existing entries"""
+        cache_instance = cache.TranslationCache("test_engine")
+        cache_instance.set("hello", "你好")
+        cache_instance.set_many([("hello", "您好"), ("world", "世界")])
+
+        # A fresh instance has an empty memory tier, so this reads sqlite
+        fresh_instance = cache.TranslationCache("test_engine")
+        self.assertEqual(fresh_instance.get("hello"), "您好")
+        self.assertEqual(fresh_instance.get("world"), "世界")
+        self.assertEqual(cache._TranslationCache.select().count(), 2)
+
+        # Large batches are split below sqlite's bound-variable limit
+        items = [(f"text{i}", f"文本{i}") for i in range(1000)]
+        cache_instance.set_many(items)
+        self.assertEqual(cache._TranslationCache.select().count(), 1002)
+
+    def test_get_many(self):
+        """Test bulk reads keep order and return None for misses"""
+        cache_instance = cache.TranslationCache("test_engine")
+        cache_instance.set("hello", "你好")
+        cache_instance.set("world", "世界")
+
+        fresh_instance = cache.TranslationCache("test_engine")
+        self.assertEqual(
+            fresh_instance.get_many(["world", "missing", "hello", "world"]),
+            ["世界", None, "你好", "世界"],
+        )
+        # Other params don't see these rows
+        other_instance = cache.TranslationCache("test_engine", {"a": 1})
+        self.assertEqual(other_instance.get_many(["hello"]), [None])
+
     # Sometimes the problem of "database is locked" occurs. Temporarily disable this test.
     # def test_thread_safety(self):
     #     """Test thread safety of cache operations"""
@@ -1,8 +1,19 @@
 import unittest
 from unittest.mock import Mock, patch, MagicMock
+import httpx
+import numpy as np
+import requests
 from pdfminer.layout import LTPage, LTChar, LTLine
 from pdfminer.pdfinterp import PDFResourceManager
-from pdf2zh.converter import PDFConverterEx, TranslateConverter
+from pdf2zh.converter import (
+    NOTRANS_RE,
+    PDFConverterEx,
+    ParagraphText,
+    TranslateConverter,
+    terminal_error,
+    transient_error,
+    wait_retry_after,
+)
 
 
 class TestPDFConverterEx(unittest.TestCase):
@@ -40,6 +51,72 @@ class TestPDFConverterEx(unittest.TestCase):
         self.assertEqual(result, 120.0)  # Expected text width
 
 
+class TestParagraphText(unittest.TestCase):
+    def test_strip_len(self):
+        text = ParagraphText()
+        self.assertEqual(text.strip_len(), 0)
+        for part in [" ", " ", "a", " ", "{v0}", " b ", " "]:
+            text.append(part)
+            self.assertEqual(text.strip_len(), len(str(text).strip()))
+        self.assertEqual(str(text), "  a {v0} b  ")
+        self.assertEqual(text.size, len(str(text)))
+
+
+class TestNoTransPattern(unittest.TestCase):
+    def test_fullmatch(self):
+        for s in [" https://arxiv.org/abs/1706.03762 ", "www.example.com", "a.b@c.org"]:
+            self.assertIsNotNone(NOTRANS_RE.fullmatch(s))
+        for s in ["see https://example.com", "Contact: a@b.org", "Introduction"]:
+            self.assertIsNone(NOTRANS_RE.fullmatch(s))
+
+
+class TestWaitRetryAfter(unittest.TestCase):
+    def retry_state(self, exception):
+        retry_state = Mock()
+        retry_state.outcome.exception.return_value = exception
+        return retry_state
+
+    def test_retry_after_header(self):
+        exception = Exception()
+        exception.response = Mock(headers={"retry-after": "3"})
+        self.assertEqual(wait_retry_after(self.retry_state(exception)), 3)
+
+    def test_default_wait(self):
+        retry_state = self.retry_state(Exception())
+        retry_state.attempt_number = 3
+        wait = wait_retry_after(retry_state)
+        self.assertGreaterEqual(wait, 0)
+        self.assertLessEqual(wait, 2)
+
+    def test_terminal_error(self):
+        exception = Exception()
+        exception.status_code = 401
+        self.assertTrue(terminal_error(exception))
+        exception = Exception()
+        exception.response = Mock(status_code=429)
+        self.assertFalse(terminal_error(exception))
+        exception.response = Mock(status_code=503)
+        self.assertFalse(terminal_error(exception))
+        self.assertFalse(terminal_error(Exception()))
+
+    def test_transient_error(self):
+        for status, expected in [(500, True), (503, True), (429, True), (401, False)]:
+            exception = Exception()
+            exception.response = Mock(status_code=status)
+            self.assertEqual(transient_error(exception), expected)
+        self.assertTrue(transient_error(TimeoutError()))
+        self.assertTrue(transient_error(requests.exceptions.ConnectionError()))
+        # SDK errors that wrap a network failure
+        try:
+            try:
+                raise httpx.ConnectTimeout("timed out")
+            except httpx.ConnectTimeout as e:
+                raise RuntimeError("Request timed out.") from e
+        except RuntimeError as e:
+            self.assertTrue(transient_error(e))
+        self.assertFalse(transient_error(ValueError()))
+
+
 class TestTranslateConverter(unittest.TestCase):
     def setUp(self):
         self.rsrcmgr = PDFResourceManager()
@@ -95,6 +172,81 @@ class TestTranslateConverter(unittest.TestCase):
         result = self.converter.receive_layout(ltpage)
         self.assertIsNotNone(result)
 
+    def test_translate_paragraphs_batch(self):
+        translator = Mock(batch_size=2)
+        translator.translate_batch.side_effect = lambda texts: [
+            t.upper() for t in texts
+        ]
+        self.converter.translator = translator
+        strings = ["alpha {v0}", "{v0}", "beta", "alpha {v0}", "gamma", "2024"]
+        self.assertEqual(
+            self.converter.translate_paragraphs(strings),
+            ["ALPHA {V0}", "{v0}", "BETA", "ALPHA {V0}", "GAMMA", "2024"],
+        )
+        # Each distinct paragraph is sent once, skipped ones never
+        sent = [call.args[0] for call in translator.translate_batch.call_args_list]
+        self.assertEqual(sorted(sum(sent, [])), ["alpha {v0}", "beta", "gamma"])
+        self.assertTrue(all(len(chunk) <= 2 for chunk in sent))
+        translator.translate.assert_not_called()
+
+    def test_translate_paragraphs(self):
+        translator = Mock(batch_size=1)
+        translator.translate.side_effect = str.upper
+        self.converter.translator = translator
+        strings = ["alpha", "beta", "alpha", " "]
+        self.assertEqual(
+            self.converter.translate_paragraphs(strings),
+            ["ALPHA", "BETA", "ALPHA", " "],
+        )
+        self.assertEqual(translator.translate.call_count, 2)
+
+    def test_translate_paragraphs_skip(self):
+        translator = Mock(batch_size=1)
+        translator.translate.side_effect = lambda s: f"<{s}>"
+        self.converter.translator = translator
+        skipped = ["{v0} {v1}", "(3)", "2024", "  "]
+        translated = ["第一章", "Table 1", "x{v0}"]
+        self.assertEqual(
+            self.converter.translate_paragraphs(skipped + translated),
+            skipped + [f"<{s}>" for s in translated],
+        )
+        sent = sorted(call.args[0] for call in translator.translate.call_args_list)
+        self.assertEqual(sent, sorted(translated))
+
+    def test_receive_layout_translates_paragraph(self):
+        font = Mock(fontname="Times-Roman")
+        font.is_vertical.return_value = False
+        font.get_descent.return_value = 0
+        ltpage = LTPage(1, (0, 0, 200, 200))
+        for i, text in enumerate("Hello world"):
+            ltpage.add(
+                LTChar(
+                    matrix=(1, 0, 0, 1, 20 + 6 * i, 100),
+                    font=font,
+                    fontsize=10,
+                    scaling=1.0,
+                    rise=0,
+                    text=text,
+                    textwidth=0.5,
+                    textdisp=0,
+                    ncs=Mock(),
+                    graphicstate=Mock(),
+                )
+            )
+        self.converter.layout = {1: np.full((200, 200), 2)}
+        tiro = Mock()
+        tiro.to_unichr.side_effect = chr
+        tiro.char_width.return_value = 0.5
+        self.converter.fontmap = {"tiro": tiro}
+        translator = Mock(batch_size=1)
+        translator.translate.side_effect = str.upper
+        self.converter.translator = translator
+
+        ops = self.converter.receive_layout(ltpage)
+        translator.translate.assert_called_once_with("Hello world")
+        self.assertIn("/tiro", ops)
+        self.assertIn("HELLO WORLD".encode().hex(), ops)
+
     def test_invalid_translation_service(self):
         with self.assertRaises(ValueError):
             TranslateConverter(
@@ -70,6 +70,44 @@ class TestOnnxModel(unittest.TestCase):
         self.assertGreater(len(results[0].boxes), 0)
         self.assertIsInstance(results[0].boxes[0], YoloBox)
 
+    def test_predict_batch(self):
+        # Mock batched model inference output
+        mock_output = np.random.random((2, 300, 6))
+        self.model.model.run.return_value = [mock_output]
+
+        images = [np.ones((500, 300, 3), dtype=np.uint8) for _ in range(2)]
+
+        results = self.model.predict_batch(images)
+
+        # Validate predictions, one result per page from a single run
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.model.model.run.call_count, 1)
+        for result in results:
+            self.assertIsInstance(result, YoloResult)
+            self.assertGreater(len(result.boxes), 0)
+
+    def test_predict_batch_fallback(self):
+        # Static batch dimension: one run per page
+        self.model._dynamic_batch = False
+        self.model.model.run.side_effect = lambda *args: [np.random.random((1, 300, 6))]
+        images = [np.ones((500, 300, 3), dtype=np.uint8) for _ in range(2)]
+        results = self.model.predict_batch(images)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.model.model.run.call_count, 2)
+
+        # Mixed page sizes can't be stacked either
+        self.model._dynamic_batch = True
+        self.model.model.run.reset_mock()
+        images = [
+            np.ones((500, 300, 3), dtype=np.uint8),
+            np.ones((300, 500, 3), dtype=np.uint8),
+        ]
+        results = self.model.predict_batch(images)
+        self.assertEqual(self.model.model.run.call_count, 2)
+        for result in results:
+            self.assertIsInstance(result, YoloResult)
+            self.assertGreater(len(result.boxes), 0)
+
 
 class TestYoloResult(unittest.TestCase):
     def test_yolo_result(self):
@@ -1,12 +1,20 @@
+import asyncio
 import unittest
 from textwrap import dedent
 from unittest import mock
 
+import httpx
+import openai
 from ollama import ResponseError as OllamaResponseError
 
 from pdf2zh import cache
 from pdf2zh.config import ConfigManager
-from pdf2zh.translator import BaseTranslator, OllamaTranslator, OpenAIlikedTranslator
+from pdf2zh.translator import (
+    BaseTranslator,
+    OllamaTranslator,
+    OpenAIlikedTranslator,
+    ZhipuTranslator,
+)
 
 # Since it is necessary to test whether the functionality meets the expected requirements,
 # private functions and private methods are allowed to be called.
@@ -77,6 +85,37 @@ class TestTranslator(unittest.TestCase):
         another_result = translator.translate(text)
         self.assertNotEqual(second_result, another_result)
 
+    def test_atranslate(self):
+        translator = AutoIncreaseTranslator("en", "zh", "test")
+        text = "Hello World"
+        first_result = asyncio.run(translator.atranslate(text))
+        # Async translation shares the cache with translate
+        self.assertEqual(first_result, translator.translate(text))
+
+    def test_translate_batch(self):
+        translator = AutoIncreaseTranslator("en", "zh", "test")
+        cached = translator.translate("Hello World")
+        results = translator.translate_batch(["Hello World", "Other", "Third"])
+        # Cached text is reused, only misses reach the service
+        self.assertEqual(results, [cached, "2", "3"])
+        self.assertEqual(translator.translate("Other"), "2")
+
+    def test_translate_batch_length_mismatch(self):
+        translator = AutoIncreaseTranslator("en", "zh", "test")
+        translator.do_translate_batch = lambda texts: texts[:-1]
+        with self.assertRaises(ValueError):
+            translator.translate_batch(["One", "Two"])
+        # Nothing partial is cached
+        self.assertIsNone(translator.cache.get("One"))
+
+    def test_noop_translation(self):
+        translator = AutoIncreaseTranslator("en", "zh", "test")
+        self.assertEqual(translator.translate("  "), "  ")
+        self.assertEqual(translator.translate_batch(["", "Hello"]), ["", "1"])
+        same_lang = AutoIncreaseTranslator("en", "EN", "test")
+        self.assertEqual(same_lang.translate("Hello"), "Hello")
+        self.assertEqual(same_lang.n, 0)
+
     def test_base_translator_throw(self):
         translator = BaseTranslator("en", "zh", "test")
         with self.assertRaises(NotImplementedError):
@@ -152,6 +191,25 @@ class TestOpenAIlikedTranslator(unittest.TestCase):
         self.assertIsNone(translator.envs["OPENAILIKED_API_KEY"])
 
 
+class TestZhipuTranslator(unittest.TestCase):
+    def test_rejected_content(self):
+        translator = ZhipuTranslator(
+            lang_in="en", lang_out="zh", model=None, envs={"ZHIPU_API_KEY": "test"}
+        )
+        error = openai.BadRequestError(
+            "rejected",
+            response=httpx.Response(
+                400, request=httpx.Request("POST", "https://open.bigmodel.cn")
+            ),
+            body={"code": "1301", "message": "rejected"},
+        )
+        with mock.patch.object(translator, "client") as mock_client:
+            mock_client.chat.completions.create.side_effect = error
+            self.assertEqual(
+                translator.do_translate("text"), "IRREPARABLE TRANSLATION ERROR"
+            )
+
+
 class TestOllamaTranslator(unittest.TestCase):
     def test_do_translate(self):
         translator = OllamaTranslator(lang_in="en", lang_out="zh", model="test:3b")